@@ -0,0 +1,539 @@
+"""Builds the MCQ question paper PDFs.
+
+Kept out of the Streamlit script so the ZIP export's worker processes can import it.
+"""
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import (
+    SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle,
+    KeepTogether, Flowable
+)
+from reportlab.platypus.doctemplate import NullActionFlowable
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_LEFT, TA_CENTER
+from reportlab.lib import colors
+from reportlab.lib.units import cm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfbase.pdfmetrics import registerFontFamily
+from reportlab import rl_config
+import os, io, re, functools, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+rl_config.shapeChecking = 0  # only validates reportlab.graphics shapes, which nothing here draws
+
+# A custom flowable for a full-width line
+class FullWidthLine(Flowable):
+    def __init__(self, width=A4[0] - 2 * cm, thickness=1, color=colors.black):
+        Flowable.__init__(self)
+        self.width = width
+        self.thickness = thickness
+        self.color = color
+
+    def wrap(self, *args):
+        return (self.width, self.thickness)
+
+    def draw(self):
+        self.canv.setStrokeColor(self.color)
+        self.canv.setLineWidth(self.thickness)
+        self.canv.line(0, 0, self.width, 0)
+
+# A custom flowable laying out the A-D options in fixed-width columns. It matches the
+# Table it replaces (left/right/top/bottom padding 10/6/3/5, top-aligned, centred) without
+# the general Table machinery.
+class OptionsGrid(Flowable):
+    left_padding, right_padding, top_padding, bottom_padding = 10, 6, 3, 5
+
+    def __init__(self, cells, col_width, cols):
+        Flowable.__init__(self)
+        self.cells = cells
+        self.col_width = col_width
+        self.cols = cols
+        self.hAlign = "CENTER"
+
+    def _row_cells(self):
+        return [self.cells[i:i + self.cols] for i in range(0, len(self.cells), self.cols)]
+
+    def wrap(self, availWidth, availHeight):
+        inner_width = self.col_width - self.left_padding - self.right_padding
+        self._rows = []
+        for row in self._row_cells():
+            heights = [p.wrap(inner_width, availHeight)[1] for p in row]
+            self._rows.append((row, heights, max(heights) + self.top_padding + self.bottom_padding))
+        self.width = self.col_width * self.cols
+        self.height = sum(r[2] for r in self._rows)
+        return (self.width, self.height)
+
+    def split(self, availWidth, availHeight):
+        # Break between rows, as the Table did, when the first row still fits
+        rows = self._row_cells()
+        if len(rows) < 2:
+            return []
+        self.wrap(availWidth, availHeight)
+        if self._rows[0][2] > availHeight:
+            return []
+        return [OptionsGrid(rows[0], self.col_width, self.cols),
+                OptionsGrid([p for row in rows[1:] for p in row], self.col_width, self.cols)]
+
+    def draw(self):
+        y = self.height
+        for row, heights, row_height in self._rows:
+            for i, (p, h) in enumerate(zip(row, heights)):
+                p.drawOn(self.canv, i * self.col_width + self.left_padding, y - self.top_padding - h)
+            y -= row_height
+
+# KeepTogether reports an impossible height so the frame always splits it, and the frame
+# then wraps every piece a second time. This stacks and spaces the pieces itself, as the
+# frame would have, and draws them in one go when the block fits where it stands; when it
+# doesn't, the split hands the pieces to a KeepTogether, which moves them on as before.
+class QuestionBlock(Flowable):
+    def __init__(self, flowables):
+        Flowable.__init__(self)
+        self.flowables = flowables
+
+    def getSpaceBefore(self):
+        return self.flowables[0].getSpaceBefore()
+
+    def getSpaceAfter(self):
+        return self.flowables[-1].getSpaceAfter()
+
+    def wrap(self, availWidth, availHeight):
+        self._placed = []
+        width = height = space_after = 0
+        for f in self.flowables:
+            w, h = f.wrapOn(self.canv, availWidth, 0xfffffff)
+            if h <= 1e-6:  # the frame draws nothing for an empty piece, nor spaces around it
+                continue
+            gap = max(f.getSpaceBefore() - space_after, 0) if self._placed else 0
+            self._placed.append((f, w, h, gap))
+            width = max(width, min(w, availWidth))
+            space_after = f.getSpaceAfter()
+            height += gap + h + space_after
+        self.height = height - space_after
+        self._availWidth = availWidth
+        if self.height > availHeight:
+            return width, 0xffffff  # too tall here, so the frame asks for a split
+        return width, self.height
+
+    def split(self, availWidth, availHeight):
+        # Leading with an action flowable makes the doc template put both back on the story
+        # instead of placing the first straight away, so the KeepTogether gets the usual wrap/split
+        return [NullActionFlowable(), KeepTogether(self.flowables)]
+
+    def draw(self):
+        y = self.height
+        for f, w, h, gap in self._placed:
+            y -= gap + h
+            f.drawOn(self.canv, 0, y, _sW=self._availWidth - w)
+            y -= f.getSpaceAfter()
+
+# ---------- FONT HANDLING ----------
+# Use a relative path that works on Streamlit cloud
+FONTS_DIR = os.path.join(os.path.dirname(__file__), "fonts", "dejavu-fonts-ttf-2.37", "ttf")
+
+def register_fonts(fonts_dir):
+    """Register DejaVu Sans with reportlab; return its name, or None if the TTF folder is missing."""
+    # pdfmetrics keeps fonts process-wide: when this module is imported again (a forkserver worker,
+    # a Streamlit reload after an edit) there is no need to parse the TTFs a second time
+    if {"DejaVuSans", "DejaVuSans-Bold"} <= set(pdfmetrics.getRegisteredFontNames()):
+        return "DejaVuSans"
+    if not os.path.isdir(fonts_dir):
+        return None
+    pdfmetrics.registerFont(TTFont('DejaVuSans', os.path.join(fonts_dir, 'DejaVuSans.ttf')))
+    pdfmetrics.registerFont(TTFont('DejaVuSans-Bold', os.path.join(fonts_dir, 'DejaVuSans-Bold.ttf')))
+    registerFontFamily('DejaVuSans', normal='DejaVuSans', bold='DejaVuSans-Bold')
+    return "DejaVuSans"
+
+# Registered once per process, on import. A failure is kept for the app to report; the PDFs
+# then fall back to Helvetica.
+try:
+    registered_font = register_fonts(FONTS_DIR)
+    font_error = None
+except Exception as e:
+    registered_font, font_error = None, e
+# getRegisteredFontNames() builds a fresh list on every call; the set of fonts is fixed from here on
+REGISTERED_FONT_NAMES = frozenset(pdfmetrics.getRegisteredFontNames())
+
+# ---------- Text cleaning / conversion helpers ----------
+SUPER_MAP = {"²":"2","³":"3","¹":"1","⁴":"4","⁵":"5","⁶":"6","⁷":"7","⁸":"8","⁹":"9","⁰":"0","⁻":"-"}
+SUB_MAP   = {"₂":"2","₃":"3","₁":"1","₄":"4","₅":"5","₆":"6","₇":"7","₈":"8","₉":"9","₀":"0"}
+
+# Unicode super/sub characters (and the stray "■" bullet) are rewritten in one translate pass
+_SUPSUB_TABLE = str.maketrans(
+    {"■": None}
+    | {k: f"<super>{v}</super>" for k, v in SUPER_MAP.items()}
+    | {k: f"<sub>{v}</sub>" for k, v in SUB_MAP.items()}
+)
+
+# All markup rules in one alternation, tried left to right in a single scan:
+#   10^-11 | m/s^2, km/s2 | H_2 | 10 x 10-5 | H2O
+# A power written straight after a match (H2^3, a_2^3, m/s2^3) is folded into it.
+# "X105" is left to the formula rule rather than read as 10 x 10.
+_MARKUP_RX = re.compile(
+    r'(?P<pow>(?P<pow_base>[0-9.\-]+)\^(?P<pow_exp>-?[0-9]+))'
+    r'|(?P<unit>(?P<unit_name>[A-Za-z]+)/[sS]\^?(?P<unit_exp>[0-9]+)(?:\^(?P<unit_pow>-?[0-9]+))?)'
+    r'|(?P<sub>(?P<sub_base>[A-Za-z\)\]])_(?P<sub_idx>[0-9]+)(?:\^(?P<sub_pow>-?[0-9]+))?)'
+    r'|(?P<sci>10\s*(?:[×x]|(?<=0)X|X(?!\d))\s*10(?P<sci_exp>-?[0-9]+)(?:\^(?P<sci_pow>-?[0-9]+))?)'
+    r'|(?P<mol>(?P<mol_el>[A-Z][a-z]?)(?P<mol_idx>\d+)(?:(?<=[0-9])\^(?P<mol_pow>-?[0-9]+))?)'
+)
+_ALNUM = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789")
+
+def _super(exp) -> str:
+    return f"<super>{exp}</super>" if exp is not None else ""
+
+def _apply_markup(s: str) -> str:
+    out = []
+    pos = 0
+    tag_end = -1  # end of the last match whose markup ends in a closing tag
+    while True:
+        m = _MARKUP_RX.search(s, pos)
+        if m is None:
+            break
+        kind, start = m.lastgroup, m.start()
+        g = m.group
+        if kind == "mol":
+            # A formula must start a word (CO2 is not C + O2), unless it directly
+            # follows other markup, as in C_2H5 or 2^2Cl3.
+            if start and s[start - 1] in _ALNUM and start != tag_end:
+                out.append(s[pos:start + 1])
+                pos = start + 1
+                continue
+            rep = f"{g('mol_el')}<sub>{g('mol_idx')}</sub>{_super(g('mol_pow'))}"
+            tagged = g("mol_pow") is not None
+        elif kind == "pow":
+            rep = f"{g('pow_base')}<super>{g('pow_exp')}</super>"
+            tagged = True
+        elif kind == "unit":
+            unit = g("unit_name")
+            if unit[-1] in "mM":
+                unit = unit[:-1] + "m"
+            rep = f"{unit}/s<super>{g('unit_exp')}</super>{_super(g('unit_pow'))}"
+            tagged = True
+        elif kind == "sub":
+            rep = f"{g('sub_base')}<sub>{g('sub_idx')}</sub>{_super(g('sub_pow'))}"
+            tagged = True
+        else:
+            rep = f"10×10<super>{g('sci_exp')}</super>{_super(g('sci_pow'))}"
+            tagged = g("sci_pow") is not None
+        out.append(s[pos:start])
+        out.append(rep)
+        pos = m.end()
+        tag_end = pos if tagged else -1
+    out.append(s[pos:])
+    return "".join(out)
+
+_TAG_RX = re.compile(r'(</?(?:super|sub|b|i)>)')
+
+def preserve_tags_escape(s: str) -> tuple[str, int]:
+    """Escape everything but the kept tags; also return the length of the text outside them."""
+    # split() keeps the captured tags at the odd indices, so only the text between them is escaped
+    parts = _TAG_RX.split(s)
+    parts[0::2] = [escape(p) for p in parts[0::2]]
+    return "".join(parts), sum(map(len, parts[0::2]))
+
+# Anything the translate table, _MARKUP_RX or a kept tag could act on; text without any
+# of it (including non-ASCII text with no super/sub characters) only needs escaping
+_MARKUP_HINT_RX = re.compile(
+    "[" + re.escape("^_<■" + "".join(SUPER_MAP) + "".join(SUB_MAP)) + "]"
+    + r'|/[sS]|[A-Z][a-z]?\d|10\s*[×xX]'
+)
+
+# Characters escape() rewrites; cells without them (most of them) are passed through as is
+_NEEDS_ESCAPE_RX = re.compile(r'[<>&]')
+
+# Option cells repeat a lot ("None of these", 1, 2, ...), within a set and across sets
+@functools.lru_cache(maxsize=8192)
+def _clean_str(s: str) -> tuple[str, int]:
+    if not _MARKUP_HINT_RX.search(s):
+        if _NEEDS_ESCAPE_RX.search(s):
+            s = escape(s)
+        return s, len(s)
+    s = s.translate(_SUPSUB_TABLE)
+    s = _apply_markup(s)
+    if not _NEEDS_ESCAPE_RX.search(s):
+        # No tags were produced and nothing needs escaping
+        return s, len(s)
+    return preserve_tags_escape(s)
+
+def clean_text(raw_text) -> tuple[str, int]:
+    """Return a cell as Paragraph markup, with the length of its visible (tag-free) text."""
+    if raw_text is None:
+        return "", 0
+    # Key the cache on the str form: 1 and 1.0 hash alike but render differently
+    return _clean_str(str(raw_text))
+
+# ---------- Draw header/footer ----------
+# Decoded once per process and shared by every page of every set
+@functools.lru_cache(maxsize=1)
+def load_logos():
+    # Adjusted for relative paths in deployment
+    paths = [os.path.join(os.path.dirname(__file__), name) for name in ("scholar.png", "logo.png")]
+    if not all(os.path.exists(path) for path in paths):
+        return None
+    return tuple(ImageReader(path) for path in paths)
+
+# Fonts and geometry of the page header/footer; none of it depends on the set or the page
+PAGE_WIDTH, PAGE_HEIGHT = A4
+HEADER_MARGIN = 1.5 * cm
+HEADING_FONT = "DejaVuSans-Bold" if "DejaVuSans-Bold" in REGISTERED_FONT_NAMES else ("DejaVuSans" if "DejaVuSans" in REGISTERED_FONT_NAMES else "Helvetica-Bold")
+NORMAL_FONT = "DejaVuSans" if "DejaVuSans" in REGISTERED_FONT_NAMES else "Helvetica"
+DARK_BLUE = colors.HexColor("#001F4D")
+
+HEADER_CENTER_X = PAGE_WIDTH / 2
+HEADER_LINE1_Y = PAGE_HEIGHT - 1.5 * cm
+HEADER_LINE2_Y = HEADER_LINE1_Y - 0.6 * cm
+HEADER_LINE3_Y = HEADER_LINE2_Y - 0.6 * cm
+HEADER_LINE4_Y = HEADER_LINE3_Y - 0.5 * cm
+HEADER_RULE_Y = HEADER_LINE4_Y - 0.8 * cm
+LOGO_SIZE = 2.5 * cm
+LOGO_Y = (HEADER_LINE1_Y + HEADER_LINE4_Y) / 2 - (LOGO_SIZE / 2)
+
+def make_header_footer(set_name, exam_details):
+    """Return the onPage callback for a set; everything except the page number is resolved here, once."""
+    school_line = exam_details["school_name"]
+    exam_line = f"{exam_details['exam_name']} - {exam_details['class_name']}"
+    board_line = exam_details["board_name"]
+    set_line = f"SET: {set_name}"
+
+    try:
+        logo_left, logo_right = load_logos() or (None, None)
+    except Exception:
+        logo_left = logo_right = None
+
+    def draw_header_footer(canvas, doc):
+        canvas.setFont(HEADING_FONT, 14)
+        canvas.setFillColor(DARK_BLUE)
+        canvas.drawCentredString(HEADER_CENTER_X, HEADER_LINE1_Y, school_line)
+        canvas.setFont(HEADING_FONT, 12)
+        canvas.drawCentredString(HEADER_CENTER_X, HEADER_LINE2_Y, exam_line)
+        canvas.setFont(NORMAL_FONT, 11)
+        canvas.drawCentredString(HEADER_CENTER_X, HEADER_LINE3_Y, board_line)
+        canvas.drawCentredString(HEADER_CENTER_X, HEADER_LINE4_Y, set_line)
+
+        if logo_left is not None:
+            try:
+                canvas.drawImage(logo_left, HEADER_MARGIN, LOGO_Y, width=LOGO_SIZE, height=LOGO_SIZE, preserveAspectRatio=True, mask="auto")
+                canvas.drawImage(logo_right, PAGE_WIDTH - HEADER_MARGIN - LOGO_SIZE, LOGO_Y, width=LOGO_SIZE, height=LOGO_SIZE, preserveAspectRatio=True, mask="auto")
+            except Exception:
+                pass
+
+        canvas.setStrokeColor(colors.black)
+        canvas.line(HEADER_MARGIN, HEADER_RULE_Y, PAGE_WIDTH - HEADER_MARGIN, HEADER_RULE_Y)
+
+        canvas.setFont(NORMAL_FONT, 9)
+        canvas.setFillColor(colors.black)
+        canvas.drawRightString(PAGE_WIDTH - HEADER_MARGIN, 0.7 * cm, f"Page {doc.page}")
+
+    return draw_header_footer
+
+# ---------- Paragraph styles ----------
+# Built once per process and shared by every set; the sheet is never modified after this
+def build_styles(use_dejavu):
+    styles = getSampleStyleSheet()
+    base_font = "DejaVuSans" if use_dejavu else styles['Normal'].fontName
+
+    # Header section
+    styles.add(ParagraphStyle(
+        name='BoldLeft', parent=styles['Normal'], fontName=f"{base_font}-Bold", fontSize=11, alignment=TA_LEFT
+    ))
+    styles.add(ParagraphStyle(
+        name='BoldCenter', parent=styles['Normal'], fontName=f"{base_font}-Bold", fontSize=11, alignment=TA_CENTER
+    ))
+    styles.add(ParagraphStyle(
+        name='BoldRight', parent=styles['Normal'], fontName=f"{base_font}-Bold", fontSize=11, alignment=2  # TA_RIGHT
+    ))
+    styles.add(ParagraphStyle(
+        name='NormalLeft', parent=styles['Normal'], fontName=base_font, fontSize=10, alignment=TA_LEFT
+    ))
+    styles.add(ParagraphStyle(name='InstructionStyle', alignment=TA_LEFT, fontSize=10, fontName=base_font, leftIndent=10))
+
+    # Styles for paragraphs within the story
+    styles.add(ParagraphStyle(name='QuestionText', alignment=TA_LEFT, fontSize=10, fontName=base_font, leading=14))
+    styles.add(ParagraphStyle(name='OptionText', alignment=TA_LEFT, fontSize=9, fontName=base_font, leading=12))
+    styles.add(ParagraphStyle(name='SectionHeading', alignment=TA_CENTER, fontSize=11, fontName=f"{base_font}-Bold", textColor=colors.white, backColor=colors.HexColor("#001F4D"), borderPadding=5))
+    return styles
+
+STYLES = build_styles("DejaVuSans" in REGISTERED_FONT_NAMES)
+
+# ---------- Header Section ----------
+# The header text only depends on the exam settings, so it is shared by every set built from them
+@functools.lru_cache(maxsize=32)
+def _header_spec(total_marks, time_duration, sections, no_of_questions, marks_per_question, instructions):
+    return (
+        f"Total Marks: {total_marks}",
+        f"Total Duration: {time_duration}",
+        tuple(f"({i+1}) {s.strip()}" for i, s in enumerate(sections)),
+        tuple(str(q) for q in no_of_questions),
+        tuple(str(m) for m in marks_per_question),
+        tuple(f"• {escape(i.strip())}" for i in instructions if i.strip()),
+    )
+
+# Table styles of the header; setStyle() only reads them, so one instance serves every set
+MARKS_TABLE_STYLE = TableStyle([
+    ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 6),
+    ('TOPPADDING', (0,0), (-1,-1), 6),
+])
+PATTERN_TABLE_STYLE = TableStyle([
+    ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+    ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+    ('GRID', (0,0), (-1,-1), 1, colors.black),
+    ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+    ('TOPPADDING', (0,0), (-1,-1), 5),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 5),
+])
+
+def create_header_section(total_marks, time_duration, sections, no_of_questions, marks_per_question, instructions):
+    marks_text, duration_text, section_texts, question_texts, mark_texts, instruction_texts = _header_spec(
+        total_marks, time_duration, tuple(sections), tuple(no_of_questions), tuple(marks_per_question), tuple(instructions)
+    )
+    story = []
+    bold_style_left = STYLES['BoldLeft']
+    bold_style_center = STYLES['BoldCenter']
+    bold_style_right = STYLES['BoldRight']
+    normal_style = STYLES['NormalLeft']
+
+    # Total Marks & Duration Row
+    marks_data = [[
+        Paragraph(marks_text, bold_style_left),
+        Paragraph(duration_text, bold_style_right)
+    ]]
+    marks_table = Table(marks_data, colWidths=[(A4[0]-2*cm)/2]*2)
+    marks_table.setStyle(MARKS_TABLE_STYLE)
+    story.append(marks_table)
+    story.append(Spacer(1, 0.2*cm))
+    
+    # Centered "PATTERN & MARKING SCHEME" title
+    story.append(Paragraph("<b>PATTERN & MARKING SCHEME</b>", bold_style_center))
+    story.append(Spacer(1, 0.3*cm))
+
+    # Pattern table
+    pattern_data = [
+        [Paragraph('Section', bold_style_left), *[Paragraph(t, bold_style_left) for t in section_texts]],
+        [Paragraph('No. Of Questions', normal_style), *[Paragraph(t, normal_style) for t in question_texts]],
+        [Paragraph('Marks Per Ques.', normal_style), *[Paragraph(t, normal_style) for t in mark_texts]]
+    ]
+    col_widths = [4.5*cm] + [5*cm]*len(sections)
+    pattern_table = Table(pattern_data, colWidths=col_widths)
+    pattern_table.setStyle(PATTERN_TABLE_STYLE)
+    story.append(pattern_table)
+    story.append(Spacer(1, 0.5*cm))
+
+    # Instructions
+    story.append(Paragraph("<b>INSTRUCTIONS</b>", bold_style_center))
+    story.append(Spacer(1, 0.3*cm))
+    instruction_style = STYLES['InstructionStyle']
+    for text in instruction_texts:
+        story.append(Paragraph(text, instruction_style))
+        story.append(Spacer(1, 0.1*cm))
+
+    story.append(Spacer(1, 0.5*cm))
+    story.append(FullWidthLine())
+    story.append(Spacer(1, 0.5*cm))
+    return story
+
+# ---------- PDF Generator ----------
+def generate_pdf_for_set(df_set, set_name, sections, total_marks, time_duration, no_of_questions, marks_per_question, instructions, exam_details):
+    story = []
+
+    first_page_story = create_header_section(total_marks, time_duration, sections, no_of_questions, marks_per_question, instructions)
+    story.extend(first_page_story)
+
+    question_number = 1
+    current_section_idx = 0
+    questions_in_section = 0
+    total_questions = sum(no_of_questions)
+    # Pull the set's row out once; indexing the DataFrame per cell builds a Series every time
+    row = df_set.iloc[0]
+    ncols = len(row)
+    # Clean every filled cell up front so the question loop only indexes into the results;
+    # the visible (tag-free) length of each cell comes along to pick the option layout
+    cleaned_row = row.map(clean_text, na_action="ignore")
+    cleaned = cleaned_row.str[0].to_numpy()
+    visible_len = cleaned_row.str[1].to_numpy()
+
+    # After the "Set" column every question takes five columns: the question and options A-D.
+    # Columns left over at the end that don't make up a whole block are never read.
+    nblocks = (ncols - 1) // 5
+    # A block is only used when the question and all four options are filled in
+    block_valid = row.notna().to_numpy()[1:1 + 5 * nblocks].reshape(-1, 5).all(axis=1)
+    text_blocks = cleaned[1:1 + 5 * nblocks].reshape(-1, 5)
+    len_blocks = visible_len[1:1 + 5 * nblocks].reshape(-1, 5)
+
+    def next_section_if_full():
+        nonlocal current_section_idx, questions_in_section
+        if current_section_idx < len(sections) and questions_in_section >= no_of_questions[current_section_idx]:
+            questions_in_section = 0
+            current_section_idx += 1
+            if current_section_idx < len(sections):
+                story.append(Spacer(1, 0.5*cm))
+                story.append(Paragraph(f"Section {current_section_idx+1} - {sections[current_section_idx].strip().upper()}", STYLES['SectionHeading']))
+                story.append(Spacer(1, 0.5*cm))
+
+    if sections:
+        story.append(Spacer(1, 0.5*cm))
+        story.append(Paragraph(f"Section 1 - {sections[0].strip().upper()}", STYLES['SectionHeading']))
+        story.append(Spacer(1, 0.5*cm))
+
+    for is_valid, (question_text, *options), option_lens in zip(block_valid, text_blocks, len_blocks):
+        if question_number > total_questions:
+            break
+        next_section_if_full()
+
+        if not is_valid:
+            continue
+
+        question_block = []
+        # Bold the question number and the question text
+        question_block.append(Paragraph(f"<b>{question_number}) {question_text}</b>", STYLES['QuestionText']))
+
+        option_cells = [Paragraph(f"{label}) {opt}", STYLES['OptionText']) for label, opt in zip("ABCD", options)]
+        if option_lens[1:].max() < 25:
+            options_table = OptionsGrid(option_cells, 4*cm, 4)
+        else:
+            options_table = OptionsGrid(option_cells, 8*cm, 2)
+
+        question_block.append(options_table)
+        question_block.append(Spacer(1, 0.1*cm))
+        story.append(QuestionBlock(question_block))
+
+        question_number += 1
+        questions_in_section += 1
+    else:
+        # Leftover columns still moved on to the next section before running out
+        if ncols > 1 + 5 * nblocks and question_number <= total_questions:
+            next_section_if_full()
+
+    pdf_buffer = io.BytesIO()
+    # Always deflate page streams (whatever the local rl_config says) and keep the output
+    # byte-identical for identical input by leaving out timestamps and random IDs
+    doc = SimpleDocTemplate(pdf_buffer, pagesize=A4,
+                            rightMargin=cm, leftMargin=cm, topMargin=4.5*cm, bottomMargin=cm,
+                            pageCompression=1, invariant=1)
+
+    on_page = make_header_footer(set_name, exam_details)
+    doc.build(story, onFirstPage=on_page, onLaterPages=on_page)
+    return pdf_buffer.getvalue()
+
+def _generate_pdf_worker(args):
+    return generate_pdf_for_set(*args)
+
+def generate_pdfs(jobs):
+    """Build one PDF per argument tuple in jobs, in parallel where possible, yielding the PDF bytes in order."""
+    workers = min(len(jobs), os.cpu_count() or 1)
+    if workers < 2:
+        yield from map(_generate_pdf_worker, jobs)
+        return
+    # Workers must not be forked from the multi-threaded Streamlit server. They come from a
+    # forkserver (spawn where there is none) and find _generate_pdf_worker by importing this
+    # module, which also registers the fonts. multiprocessing also re-runs the app script in
+    # each worker as __mp_main__ (harmless: outside `streamlit run` its widgets stay empty), so
+    # the forkserver preloads what both need and every worker forks from there ready to go.
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload([__name__, "pandas", "streamlit"])
+    else:
+        ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as ex:
+        yield from ex.map(_generate_pdf_worker, jobs)